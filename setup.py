@@ -24,4 +24,10 @@ setuptools.setup(
         'imagesize>=1.4.0',
         'pydantic==1.9.1'
     ],
+    extras_require={
+        'speedups': [
+            'orjson>=3.6.0',
+            'ijson>=3.1',
+        ],
+    },
 )
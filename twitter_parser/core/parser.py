@@ -18,21 +18,39 @@
     along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """
 
-from typing import Optional, List
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice, repeat
+from pathlib import Path
+from typing import Optional, List, Iterator, Iterable, Set, Dict, Tuple
 from urllib.parse import urlparse
 import glob
 import json
 import logging
+import mmap
 import os
 import re
 import shutil
-from zipfile import ZipFile
+import sys
+from zipfile import ZipFile, ZipInfo
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional speed-up, install with `pip install twitter_parser[speedups]`
+    orjson = None
+
+try:
+    import ijson
+except ImportError:  # optional, lets large tweet archives be parsed incrementally
+    ijson = None
 
 from twitter_parser.schemas.tweet_data import TwitterUserInfo, User, Tweet, TweetType, DirectMessage, \
     GroupDirectMessages, GroupDirectMessage
-from twitter_parser.utils.constants import UTF_8, GUEST_TOKEN, READ_MODE, ACCOUNT, USERNAME, USER_URL_TEMPLATE, \
+from twitter_parser.utils.constants import UTF_8, GUEST_TOKEN, READ_BINARY_MODE, ACCOUNT, USERNAME, USER_URL_TEMPLATE, \
     DATA, ACCOUNT_FILE, TWITTER_PARSER_OUTPUT, MEDIA, TWITTER_PARSER_CACHE, TWITTER_GUEST_TOKEN_ENDPOINT, \
     TWITTER_USER_METADATA_ENDPOINT, BEARER_TOKEN, SCREEN_NAME, TWEET, TWEET_CREATED_AT, TWEET_FULL_TEXT, TWEET_ID_STR, \
     TWEET_ENTITIES, TWEET_MEDIA, URLS, URL, TWEET_EXPANDED_URL, TWEET_DISPLAY_URL, TWEET_INDICES, RT, \
@@ -43,10 +61,58 @@ from twitter_parser.utils.constants import UTF_8, GUEST_TOKEN, READ_MODE, ACCOUN
     CONVERSATION_ID, MESSAGES, MESSAGE_CREATE, SENDER_ID, RECIPIENT_ID, TEXT, CREATED_AT, EXPANDED, DM_MEDIA_URLS, \
     DIRECT_MESSAGE_MEDIA, JOIN_CONVERSATION, INITIATING_USER_ID, PARTICIPANTS_SNAPSHOT, PARTICIPANTS_JOIN, USER_IDS, \
     DIRECT_MESSAGES_GROUP_FILE, DIRECT_MESSAGES_GROUP_MEDIA, CONVERSATION_NAME_UPDATE, NAME, KNOWN_TWEETS_JSON, \
-    LIST_OF_FILES
+    LIST_OF_FILES, TWEET_CONVERSION_BATCH_SIZE, TWITTER_USER_LOOKUP_BATCH_SIZE, TWITTER_API_MAX_WORKERS, \
+    TWITTER_API_MAX_RETRIES, USER_HANDLES_CACHE_FILE, ZIP_EXTRACTION_MAX_WORKERS, WRITE_BINARY_MODE, \
+    MEDIA_COPY_MAX_WORKERS, JS_FILE_STREAMING_MIN_SIZE, JS_FILE_MMAP_MIN_SIZE
+
+
+# leading '@username ' mentions of a reply
+_REPLY_PREFIX_RE = re.compile(r'^(?:@[0-9A-Za-z_]+ )+')
+# whitespace-separated words starting with 'scheme://', the only words urlparse can find a netloc in
+_URL_CANDIDATE_RE = re.compile(r'(?<!\S)[0-9A-Za-z+.\-]+://\S*')
+# `\uD800` - `\uDFFF` escapes in a .js file, which ijson's C backend doesn't decode like the json module does
+_SURROGATE_ESCAPE_RE = re.compile(rb'\\u[dD][89a-fA-F]')
+
+
+def _json_loads(data):
+    """Parses a JSON document given as `bytes`, `memoryview` or `str`, using orjson when it is available."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson rejects some input the json module accepts, e.g. escaped lone surrogates in message texts,
+            # so retry with the json module to parse everything the archive could always be parsed with
+            pass
+    if isinstance(data, memoryview):
+        # the json module only takes str, bytes and bytearray
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def _join_words(words: List[str]) -> str:
+    """Joins words with single spaces, keeping the trailing space the markdown bodies have always had."""
+    return ' '.join(words) + ' ' if words else ''
+
+
+def _json_dumps(obj) -> bytes:
+    """Serializes `obj` to UTF-8 encoded JSON, using orjson when it is available."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode(UTF_8)
+
+
+def _fast_copy(src: str, dst: str):
+    """Copies `src` to `dst` by hard-linking it, so the media of an archive is not duplicated on disk.
+       Falls back to a regular copy where links are not possible, e.g. across file systems."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy(src, dst)
 
 
 class UserData:
+    __slots__ = ('user_id', 'handle')
+
     def __init__(self, user_id: str, handle: str):
         if user_id is None:
             raise ValueError('user_id = null is not an allowed value in UserData.')
@@ -81,11 +147,28 @@ class PathConfig:
         self.dir_output = os.path.join(self.dir_archive, TWITTER_PARSER_OUTPUT)
         self.dir_output_media = os.path.join(self.dir_output, MEDIA)
         self.dir_output_cache = os.path.join(self.dir_archive, TWITTER_PARSER_CACHE)
+        self.file_user_handles_cache = os.path.join(self.dir_output_cache, USER_HANDLES_CACHE_FILE)
         self.files_input_tweets = self.find_files_input_tweets()
 
         # structured like an actual tweet output file, can be used to compute relative urls to a media file
         self.example_file_output_tweets = self.create_path_for_file_output_tweets(year=2020, month=12)
 
+        # prefixes for building paths and relative urls of media files by plain concatenation with the file name
+        self.input_media_prefix = os.path.join(self.dir_input_media, '')
+        self.output_media_prefix = os.path.join(self.dir_output_media, '')
+        self.output_media_url_prefix = os.path.relpath(
+            self.dir_output_media, os.path.split(self.example_file_output_tweets)[0]).replace("\\", "/") + '/'
+        # list the tweet media once, instead of probing the file system for every media file of every tweet
+        self.input_media_files, self.input_media_files_by_id = self.index_media_dir(self.dir_input_media)
+        # same for the media of direct messages and group direct messages
+        self.dir_input_dm_media = os.path.join(self.dir_input_data, DIRECT_MESSAGE_MEDIA)
+        self.input_dm_media_prefix = os.path.join(self.dir_input_dm_media, '')
+        self.input_dm_media_files, self.input_dm_media_files_by_id = self.index_media_dir(self.dir_input_dm_media)
+        self.dir_input_group_dm_media = os.path.join(self.dir_input_data, DIRECT_MESSAGES_GROUP_MEDIA)
+        self.input_group_dm_media_prefix = os.path.join(self.dir_input_group_dm_media, '')
+        self.input_group_dm_media_files, self.input_group_dm_media_files_by_id = \
+            self.index_media_dir(self.dir_input_group_dm_media)
+
     def create_path_for_file_output_tweets(self, year: int, month: int, file_format: str = "html",
                                            kind: str = "tweets") -> str:
         """Builds the path for a tweet-archive file based on some properties."""
@@ -105,6 +188,22 @@ class PathConfig:
             exit()
         return input_media_dirs[0]
 
+    @staticmethod
+    def index_media_dir(dir_media: str) -> Tuple[Set[str], Dict[str, List[str]]]:
+        """Returns the names of the files in a media folder, and the same names grouped by the tweet or message id
+        they start with (media files in the archive are named `<id>-<original file name>`)."""
+        media_files = set()
+        media_files_by_id = defaultdict(list)
+        if not os.path.isdir(dir_media):
+            # archives without any (group) direct message media don't have the folder
+            return media_files, media_files_by_id
+        with os.scandir(dir_media) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    media_files.add(entry.name)
+                    media_files_by_id[entry.name.split('-', 1)[0]].append(entry.name)
+        return media_files, media_files_by_id
+
     def find_files_input_tweets(self) -> list:
         """Identify the tweet archive's file and folder names -
         they change slightly depending on the archive size it seems."""
@@ -118,24 +217,59 @@ class PathConfig:
         return files_paths_input_tweets
 
 
+# parser used by the worker processes of `TwitterDataParser._get_tweets`, set by `_init_tweet_worker`
+_worker_parser: Optional['TwitterDataParser'] = None
+
+
+def _init_tweet_worker(parser: 'TwitterDataParser'):
+    global _worker_parser
+    _worker_parser = parser
+
+
+def _convert_tweet_batch(tweets: Iterable[dict]) -> Tuple[List[Tweet], dict, list, list]:
+    """Converts a batch of tweets in a worker process. The user handles, media sources and media files to copy
+       found on the way are returned as well, for the main process to merge."""
+    users = {}
+    media_sources = []
+    media_copies = []
+    converted = [_worker_parser._convert_tweet(tweet=tweet, media_sources=media_sources, users=users,
+                                               media_copies=media_copies) for tweet in tweets]
+    return converted, users, media_sources, media_copies
+
+
+def _convert_tweets_js_file(filename: str) -> Tuple[List[Tweet], dict, list, list]:
+    """Reads and converts all tweets of one tweets .js file in a worker process, see `_convert_tweet_batch`.
+       The converted tweets of the whole file are returned at once anyway, so the file isn't streamed."""
+    return _convert_tweet_batch(_worker_parser._read_json_from_js_file(filename=filename))
+
+
 class TwitterDataParser:
 
-    def __init__(self, path_to_zip_file: str):
+    def __init__(self, path_to_zip_file: str, max_workers: int = 1):
         self._file_path = path_to_zip_file
+        # number of processes to convert the tweets with, 1 converts them in the current process
+        self._max_workers = max_workers
         self._archive_path = self._extract_and_find_archive()
         self._paths = PathConfig(dir_archive=self._archive_path)
         self.user_name = self._extract_username()
-        self._users = {}
+        self._users = self._load_user_handles()
         self._user_id_url_template = USER_URL_TEMPLATE
+        # bound once, the parser is pickled for the tweet worker processes so these can't be lambdas
+        self._user_id_url = self._user_id_url_template.format
+        self._tweet_url_prefix = TWEET_URL.format(username=self.user_name, tweet_id_str='')
 
         # To make sure we are updating the old files with new data
         self._migrate_old_output()
+        # media files in the output folder, from earlier runs or copied there by this one
+        self._output_media_paths: Set[str] = {entry.path for entry in os.scandir(self._paths.dir_output_media)}
 
         # Tweets
         self.tweets = self._get_tweets()
 
         # Bulk lookup for user handles from followers, followings, direct messages and group direct messages
         self._bulk_look_up_for_user_handles()
+        # user id -> handle, so that the messages below resolve each handle with a single lookup
+        self._handle_cache: Dict[str, str] = {user_id: user.handle for user_id, user in self._users.items()}
 
         # Following
         self.following = self._get_following_users()
@@ -154,28 +288,43 @@ class TwitterDataParser:
         Extracts the zip file into current working directory, and returns the archive file path
         """
 
-        cd: str = os.getcwd()
-
-        list_file_name: List[str] = self._file_path.split('/')
-        file_name_final: str = list_file_name[len(list_file_name) - 1]
-        file_name_for_extracted_data: str = f'{cd}/{file_name_final[:len(file_name_final) - 4]}'
-
-        if f'{file_name_final[len(file_name_final) - 4:]}' != '.zip':
+        zip_file_path = Path(self._file_path)
+        if zip_file_path.suffix != '.zip':
             msg: str = "Please provide the zip file of archived twitter data"
             raise Exception(msg)
 
+        file_name_for_extracted_data: str = str(Path.cwd() / zip_file_path.stem)
+
         # Specifying the zip file name
         file_name: str = self._file_path
 
         # Opening the zip file in READ mode
         with ZipFile(file_name, 'r') as zipObj:
-            # extracting all the files
-            logging.info(f'Extracting all the files now to {file_name_for_extracted_data}')
-            zipObj.extractall(path=file_name_for_extracted_data)
-            logging.info('Done!')
+            members: List[ZipInfo] = zipObj.infolist()
+
+        # extracting all the files, spread over threads with the biggest files first to balance their load
+        logging.info(f'Extracting all the files now to {file_name_for_extracted_data}')
+        members.sort(key=lambda member: member.file_size, reverse=True)
+        members_per_thread = [members[i::ZIP_EXTRACTION_MAX_WORKERS] for i in range(ZIP_EXTRACTION_MAX_WORKERS)]
+        with ThreadPoolExecutor(max_workers=ZIP_EXTRACTION_MAX_WORKERS) as executor:
+            list(executor.map(self._extract_zip_members, repeat(file_name), members_per_thread,
+                              repeat(file_name_for_extracted_data)))
+        logging.info('Done!')
 
         return file_name_for_extracted_data
 
+    @staticmethod
+    def _extract_zip_members(file_name: str, members: List[ZipInfo], path: str):
+        """Extracts some members of a zip file into `path`. Opens its own ZipFile, as those can't be shared between
+           threads."""
+        with ZipFile(file_name, 'r') as zipObj:
+            for member in members:
+                try:
+                    zipObj.extract(member, path=path)
+                except FileExistsError:
+                    # another thread created the same folder in the meantime, extracting again will find it
+                    zipObj.extract(member, path=path)
+
     def _extract_username(self) -> str:
         """Returns the user's Twitter username from account.js."""
         account = self._read_json_from_js_file(filename=self._paths.file_account_js)
@@ -236,68 +385,62 @@ class TwitterDataParser:
 
     def _bulk_look_up_for_user_handles(self):
 
-        following_ids: List[str] = self._collect_user_ids_from_followings()
+        following_ids: Set[str] = self._collect_user_ids_from_followings()
         logging.info(f'found {len(following_ids)} user IDs in followings.')
 
-        follower_ids: List[str] = self._collect_user_ids_from_followers()
+        follower_ids: Set[str] = self._collect_user_ids_from_followers()
         logging.info(f'found {len(follower_ids)} user IDs in followers.')
 
-        dms_user_ids: List[str] = self._collect_user_ids_from_direct_messages()
+        dms_user_ids: Set[str] = self._collect_user_ids_from_direct_messages()
         logging.info(f'found {len(dms_user_ids)} user IDs in direct messages.')
 
-        group_dms_user_ids: List[str] = self._collect_user_ids_from_group_direct_messages()
+        group_dms_user_ids: Set[str] = self._collect_user_ids_from_group_direct_messages()
         logging.info(f'found {len(group_dms_user_ids)} user IDs in group direct messages.')
 
         # NOTE -> Bulk lookup for user handles from followers, followings, direct messages and group direct messages
-        collected_user_ids_without_followers: List[str] = list(
-            set(following_ids).union(set(dms_user_ids)).union(set(group_dms_user_ids))
-        )
-        collected_user_ids_only_in_followers: set = set(follower_ids).difference(
-            set(collected_user_ids_without_followers))
-        collected_user_ids: List[str] = list(set(collected_user_ids_without_followers)
-                                             .union(collected_user_ids_only_in_followers))
+        collected_user_ids: Set[str] = following_ids | follower_ids | dms_user_ids | group_dms_user_ids
 
         logging.info(f'\nfound {len(collected_user_ids)} user IDs overall.')
 
-        self._lookup_users(user_ids=collected_user_ids)
+        self._lookup_users(user_ids=list(collected_user_ids))
 
-    def _collect_user_ids_from_followings(self) -> List[str]:
+    def _collect_user_ids_from_followings(self) -> Set[str]:
         """
          Collect all user ids that appear in the followings archive data.
          (For use in bulk online lookup from Twitter.)
         """
         # read JSON file from archive
         following_json = self._read_json_from_js_file(filename=os.path.join(self._paths.dir_input_data, FOLLOWING_FILE))
-        # collect all user ids in a list
-        following_ids: List[str] = []
+        # collect all user ids in a set
+        following_ids: Set[str] = set()
         for follow in following_json:
             if FOLLOWING in follow and ACCOUNT_ID in follow[FOLLOWING]:
-                following_ids.append(follow[FOLLOWING][ACCOUNT_ID])
+                following_ids.add(follow[FOLLOWING][ACCOUNT_ID])
 
         return following_ids
 
-    def _collect_user_ids_from_followers(self) -> List[str]:
+    def _collect_user_ids_from_followers(self) -> Set[str]:
         """
          Collect all user ids that appear in the followers archive data.
          (For use in bulk online lookup from Twitter.)
         """
         # read JSON file from archive
         follower_json = self._read_json_from_js_file(filename=os.path.join(self._paths.dir_input_data, FOLLOWER_FILE))
-        # collect all user ids in a list
-        follower_ids = []
+        # collect all user ids in a set
+        follower_ids = set()
         for follower in follower_json:
             if FOLLOWER in follower and ACCOUNT_ID in follower[FOLLOWER]:
-                follower_ids.append(follower[FOLLOWER][ACCOUNT_ID])
+                follower_ids.add(follower[FOLLOWER][ACCOUNT_ID])
 
         return follower_ids
 
-    def _collect_user_ids_from_direct_messages(self) -> List[str]:
+    def _collect_user_ids_from_direct_messages(self) -> Set[str]:
         """
          Collect all user ids that appear in the direct messages archive data.
          (For use in bulk online lookup from Twitter.)
         """
         # read JSON file from archive
-        dms_json = self._read_json_from_js_file(filename=os.path.join(self._paths.dir_input_data, DIRECT_MESSAGES_FILE))
+        dms_json = self._iter_json_from_js_file(filename=os.path.join(self._paths.dir_input_data, DIRECT_MESSAGES_FILE))
         # collect all user ids in a set
         dms_user_ids = set()
         for conversation in dms_json:
@@ -308,23 +451,21 @@ class TwitterDataParser:
                 dms_user_ids.add(user1_id)
                 dms_user_ids.add(user2_id)
 
-        return list(dms_user_ids)
+        return dms_user_ids
 
-    def _collect_user_ids_from_group_direct_messages(self) -> List[str]:
+    def _collect_user_ids_from_group_direct_messages(self) -> Set[str]:
         """
          Collect all user ids that appear in the group direct messages archive data.
          (For use in bulk online lookup from Twitter.)
         """
         # read JSON file from archive
-        group_dms_json = self._read_json_from_js_file(
+        group_dms_json = self._iter_json_from_js_file(
             filename=os.path.join(self._paths.dir_input_data, DIRECT_MESSAGES_GROUP_FILE))
         # collect all user ids in a set
         group_dms_user_ids = set()
         for conversation in group_dms_json:
-            participants = self._find_group_dm_conversation_participant_ids(conversation)
-            for participant_id in participants:
-                group_dms_user_ids.add(participant_id)
-        return list(group_dms_user_ids)
+            group_dms_user_ids.update(self._find_group_dm_conversation_participant_ids(conversation))
+        return group_dms_user_ids
 
     @staticmethod
     def _find_group_dm_conversation_participant_ids(conversation: dict) -> set:
@@ -332,20 +473,24 @@ class TwitterDataParser:
         Find IDs of all participating Users in a group direct message conversation
         """
         group_user_ids = set()
-        if DM_CONVERSATION in conversation and CONVERSATION_ID in conversation[DM_CONVERSATION]:
-            dm_conversation = conversation[DM_CONVERSATION]
-            if MESSAGES in dm_conversation:
-                for message in dm_conversation[MESSAGES]:
-                    if MESSAGE_CREATE in message:
-                        group_user_ids.add(message[MESSAGE_CREATE][SENDER_ID])
-                    elif JOIN_CONVERSATION in message:
-                        group_user_ids.add(message[JOIN_CONVERSATION][INITIATING_USER_ID])
-                        for participant_id in message[JOIN_CONVERSATION][PARTICIPANTS_SNAPSHOT]:
-                            group_user_ids.add(participant_id)
-                    elif PARTICIPANTS_JOIN in message:
-                        group_user_ids.add(message[PARTICIPANTS_JOIN][INITIATING_USER_ID])
-                        for participant_id in message[PARTICIPANTS_JOIN][USER_IDS]:
-                            group_user_ids.add(participant_id)
+        dm_conversation = conversation.get(DM_CONVERSATION)
+        if not dm_conversation or CONVERSATION_ID not in dm_conversation:
+            return group_user_ids
+        add_user_id = group_user_ids.add
+        for message in dm_conversation.get(MESSAGES, ()):
+            message_create = message.get(MESSAGE_CREATE)
+            if message_create:
+                add_user_id(message_create[SENDER_ID])
+                continue
+            join_conversation = message.get(JOIN_CONVERSATION)
+            if join_conversation:
+                add_user_id(join_conversation[INITIATING_USER_ID])
+                group_user_ids.update(join_conversation[PARTICIPANTS_SNAPSHOT])
+                continue
+            participants_join = message.get(PARTICIPANTS_JOIN)
+            if participants_join:
+                add_user_id(participants_join[INITIATING_USER_ID])
+                group_user_ids.update(participants_join[USER_IDS])
         return group_user_ids
 
     def _lookup_users(self, user_ids: List[str]):
@@ -358,6 +503,10 @@ class TwitterDataParser:
 
         try:
             with requests.Session() as session:
+                # retry rate limited and failed requests, and keep a connection per concurrent user lookup
+                retries = Retry(total=TWITTER_API_MAX_RETRIES, backoff_factor=1,
+                                status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+                session.mount('https://', HTTPAdapter(max_retries=retries, pool_maxsize=TWITTER_API_MAX_WORKERS))
                 bearer_token = BEARER_TOKEN
                 guest_token = self._get_twitter_api_guest_token(session=session, bearer_token=bearer_token)
                 retrieved_users = self._get_twitter_users(session=session, bearer_token=bearer_token,
@@ -365,9 +514,42 @@ class TwitterDataParser:
                 for user_id, user in retrieved_users.items():
                     if user[SCREEN_NAME] is not None:
                         self._users[user_id] = UserData(user_id=user_id, handle=user[SCREEN_NAME])
+            self._save_user_handles()
         except Exception as err:
             logging.error(f'Failed to download user data: {err}')
 
+    def _load_user_handles(self) -> dict:
+        """Returns the user_id:user_handle mappings cached by earlier runs in paths.file_user_handles_cache."""
+        users = {}
+        if os.path.isfile(self._paths.file_user_handles_cache):
+            try:
+                with open(self._paths.file_user_handles_cache, READ_BINARY_MODE) as f:
+                    handles = _json_loads(f.read())
+            except ValueError as err:
+                logging.warning(f'Ignoring unreadable user handles cache {self._paths.file_user_handles_cache}: {err}')
+            else:
+                if not isinstance(handles, dict):
+                    logging.warning(f'Ignoring user handles cache {self._paths.file_user_handles_cache}: '
+                                    f'expected a JSON object')
+                    return users
+                for user_id, handle in handles.items():
+                    if isinstance(handle, str):
+                        users[user_id] = UserData(user_id=user_id, handle=handle)
+                    else:
+                        logging.warning(f'Ignoring invalid handle {handle!r} of user {user_id} '
+                                        f'in user handles cache {self._paths.file_user_handles_cache}')
+        return users
+
+    def _save_user_handles(self):
+        """Caches the known user_id:user_handle mappings in paths.file_user_handles_cache, so that later runs
+           don't have to download them again."""
+        handles = {user_id: user.handle for user_id, user in self._users.items()}
+        file_tmp = self._paths.file_user_handles_cache + '.tmp'
+        with open(file_tmp, WRITE_BINARY_MODE) as f:
+            f.write(_json_dumps(handles))
+        # replace the cache in one step, so that an interrupted run never leaves a truncated file behind
+        os.replace(file_tmp, self._paths.file_user_handles_cache)
+
     @staticmethod
     def _get_twitter_api_guest_token(session, bearer_token: str) -> str:
         """Returns a Twitter API guest token for the current session."""
@@ -375,30 +557,32 @@ class TwitterDataParser:
                                             headers={'authorization': f'Bearer {bearer_token}'},
                                             timeout=2,
                                             )
-        guest_token = json.loads(guest_token_response.content)[GUEST_TOKEN]
+        guest_token = _json_loads(guest_token_response.content)[GUEST_TOKEN]
         if not guest_token:
             raise Exception(f"Failed to retrieve guest token")
         return guest_token
 
     @staticmethod
     def _get_twitter_users(session, bearer_token: str, guest_token: str, user_ids: list) -> dict:
-        """Asks Twitter for all metadata associated with user_ids."""
-        users = {}
-        while user_ids:
-            max_batch = 100
-            user_id_batch = user_ids[:max_batch]
-            user_ids = user_ids[max_batch:]
-            user_id_list = ",".join(user_id_batch)
-            query_url = TWITTER_USER_METADATA_ENDPOINT.format(user_id_list=user_id_list)
-            response = session.get(query_url,
-                                   headers={'authorization': f'Bearer {bearer_token}', 'x-guest-token': guest_token},
-                                   timeout=2,
-                                   )
+        """Asks Twitter for all metadata associated with user_ids, in concurrent batches."""
+        headers = {'authorization': f'Bearer {bearer_token}', 'x-guest-token': guest_token}
+        query_urls = [
+            TWITTER_USER_METADATA_ENDPOINT.format(
+                user_id_list=",".join(user_ids[start:start + TWITTER_USER_LOOKUP_BATCH_SIZE]))
+            for start in range(0, len(user_ids), TWITTER_USER_LOOKUP_BATCH_SIZE)
+        ]
+
+        def get_users_batch(query_url: str) -> list:
+            response = session.get(query_url, headers=headers, timeout=2)
             if not response.status_code == 200:
                 raise Exception(f'Failed to get user handle: {response}')
-            response_json = json.loads(response.content)
-            for user in response_json:
-                users[user[TWEET_ID_STR]] = user
+            return _json_loads(response.content)
+
+        users = {}
+        with ThreadPoolExecutor(max_workers=TWITTER_API_MAX_WORKERS) as executor:
+            for response_json in executor.map(get_users_batch, query_urls):
+                for user in response_json:
+                    users[user[TWEET_ID_STR]] = user
         return users
 
     def _get_tweets(self) -> List[Tweet]:
@@ -410,24 +594,69 @@ class TwitterDataParser:
         logging.info('Started parsing the tweets...')
         tweets: List[Tweet] = []
         media_sources = []
-        for tweets_js_filename in self._paths.files_input_tweets:
-            json_obj = self._read_json_from_js_file(filename=tweets_js_filename)
-            for tweet in json_obj:
-                tweets.append(self._convert_tweet(tweet=tweet, media_sources=media_sources, users=self._users))
+        media_copies = []
+        if self._max_workers > 1:
+            with ProcessPoolExecutor(max_workers=self._max_workers, initializer=_init_tweet_worker,
+                                     initargs=(self,)) as executor:
+                if len(self._paths.files_input_tweets) > 1:
+                    # the workers read a whole file each, so the raw tweets are parsed in parallel as well
+                    # and don't have to be passed between the processes
+                    batches = executor.map(_convert_tweets_js_file, self._paths.files_input_tweets)
+                else:
+                    batches = executor.map(_convert_tweet_batch, self._iter_tweet_batches())
+                for batch_tweets, batch_users, batch_media_sources, batch_media_copies in batches:
+                    tweets += batch_tweets
+                    self._users.update(batch_users)
+                    media_sources += batch_media_sources
+                    media_copies += batch_media_copies
+        else:
+            for tweets_js_filename in self._paths.files_input_tweets:
+                for tweet in self._iter_json_from_js_file(filename=tweets_js_filename):
+                    tweets.append(self._convert_tweet(tweet=tweet, media_sources=media_sources, users=self._users,
+                                                      media_copies=media_copies))
+        self._copy_media_files(media_copies=media_copies)
 
         logging.info(f'Parsing the tweets are done, found {len(tweets)} tweets...')
 
         return tweets
 
-    def _convert_tweet(self, tweet: dict, media_sources: list, users: dict) -> Tweet:
+    def _iter_tweet_batches(self) -> Iterator[List[dict]]:
+        """Yields the tweets of all paths.files_input_tweets in lists of TWEET_CONVERSION_BATCH_SIZE.
+           The files are read in one go: the process pool's map consumes all batches up front, so streaming them
+           with ijson would only be slower without saving any memory."""
+        for tweets_js_filename in self._paths.files_input_tweets:
+            tweets = iter(self._read_json_from_js_file(filename=tweets_js_filename))
+            while True:
+                batch = list(islice(tweets, TWEET_CONVERSION_BATCH_SIZE))
+                if not batch:
+                    break
+                yield batch
+
+    def _copy_media_files(self, media_copies: List[Tuple[str, str]]):
+        """Copies (archive media path, output media path) pairs, skipping files that are already in the output.
+           The copies are blocking file I/O, so they run on a thread pool."""
+        sources, destinations = [], []
+        for archive_media_path, file_output_media in media_copies:
+            if file_output_media not in self._output_media_paths:
+                self._output_media_paths.add(file_output_media)
+                sources.append(archive_media_path)
+                destinations.append(file_output_media)
+        if not sources:
+            return
+        with ThreadPoolExecutor(max_workers=MEDIA_COPY_MAX_WORKERS) as executor:
+            list(executor.map(_fast_copy, sources, destinations))
+
+    def _convert_tweet(self, tweet: dict, media_sources: list, users: dict, media_copies: list) -> Tweet:
         """Converts a JSON-format tweet and return Tweet"""
         if TWEET in tweet.keys():
             tweet = tweet[TWEET]
         timestamp_str = tweet[TWEET_CREATED_AT]
         # Example: Tue Mar 19 14:05:17 +0000 2019
-        body_markdown: str = ""
-        for word in tweet[TWEET_FULL_TEXT].split():
-            body_markdown += word + " "
+        full_text: str = tweet[TWEET_FULL_TEXT]
+        words: List[str] = full_text.split()
+        entities: Optional[dict] = tweet.get(TWEET_ENTITIES)
+        extended_entities: Optional[dict] = tweet.get(TWEET_EXTENDED_ENTITIES)
+        body_markdown: str = _join_words(words)
         tweet_id_str = tweet[TWEET_ID_STR]
 
         tweet_type: TweetType = TweetType.TWEET
@@ -436,26 +665,21 @@ class TwitterDataParser:
         replying_to_tweet_by_user: Optional[str] = None
         tweet_data: str
         tweeted_at: str = timestamp_str
-        tweet_year: str = timestamp_str.split()[5]
+        # the timestamp has a fixed format ending with the year, see the example above. The same few years, handles
+        # and names recur across thousands of tweets: intern them to keep one copy each
+        tweet_year: str = sys.intern(timestamp_str[-4:])
         tweet_attached_media: Optional[str] = None
 
-        if tweet[TWEET_FULL_TEXT].split()[0] == RT:
+        if words[0] == RT:
             tweet_type = TweetType.RETWEET
-            retweeted_from_handle = tweet[TWEET_FULL_TEXT].split()[1]
-            retweeted_from = retweeted_from_handle[1:len(retweeted_from_handle) - 1]
-            body_markdown: str = ""
-            words: int = 0
-            for word in tweet[TWEET_FULL_TEXT].split():
-                if words > 1:
-                    body_markdown += word + " "
-                else:
-                    words += 1
+            retweeted_from = sys.intern(words[1][1:-1])
+            body_markdown = _join_words(words[2:])
 
         # NOTE -> For old tweets before embedded t.co redirects were added, ensure the links are added to the urls
         #         entities list so that we can build correct links later on.
-        if TWEET_ENTITIES in tweet and TWEET_MEDIA not in tweet[TWEET_ENTITIES] \
-                and len(tweet[TWEET_ENTITIES].get(URLS, [])) == 0:
-            for word in tweet[TWEET_FULL_TEXT].split():
+        if entities and TWEET_MEDIA not in entities and len(entities.get(URLS, [])) == 0:
+            for match in _URL_CANDIDATE_RE.finditer(full_text):
+                word = match[0]
                 try:
                     url = urlparse(word)
                 except ValueError:
@@ -466,17 +690,16 @@ class TwitterDataParser:
                         netloc_short = url.netloc[4:] if url.netloc.startswith("www.") else url.netloc
                         path_short = url.path if len(url.path + '?' + url.query) < 15 \
                             else (url.path + '?' + url.query)[:15] + '\u2026'
-                        tweet[TWEET_ENTITIES][URLS].append({
+                        entities[URLS].append({
                             URL: word,
                             TWEET_EXPANDED_URL: word,
                             TWEET_DISPLAY_URL: netloc_short + path_short,
-                            TWEET_INDICES: [tweet[TWEET_FULL_TEXT].index(word),
-                                            tweet[TWEET_FULL_TEXT].index(word) + len(word)],
+                            TWEET_INDICES: [match.start(), match.end()],
                         })
 
         # NOTE -> replace t.co URLs with their original versions
-        if TWEET_ENTITIES in tweet and URLS in tweet[TWEET_ENTITIES]:
-            for url in tweet[TWEET_ENTITIES][URLS]:
+        if entities and URLS in entities:
+            for url in entities[URLS]:
                 if URL in url and TWEET_EXPANDED_URL in url:
                     expanded_url = url[TWEET_EXPANDED_URL]
                     body_markdown = body_markdown.replace(url[URL], expanded_url)
@@ -485,14 +708,15 @@ class TwitterDataParser:
         #         being replied to the tweet being replied to
         if TWEET_REPLY_TO_STATUS_ID in tweet:
             # match and remove all occurrences of '@username ' at the start of the body
-            replying_to = re.match(r'^(@[0-9A-Za-z_]* )*', body_markdown)[0]
+            replying_to_match = _REPLY_PREFIX_RE.match(body_markdown)
+            replying_to = replying_to_match[0] if replying_to_match else ''
             if replying_to:
                 body_markdown = body_markdown[len(replying_to):]
             else:
                 # no '@username ' in the body: we're replying to self
                 replying_to = f'@{self.user_name}'
 
-            names = replying_to.split()
+            names = [sys.intern(name) for name in replying_to.split()]
             tweet_type = TweetType.REPLY
             replied_to_names_list = names
 
@@ -504,345 +728,361 @@ class TwitterDataParser:
                                                                in_reply_to_status_id=in_reply_to_status_id)
 
         # Replace image URLs with image links to local files
-        if TWEET_ENTITIES in tweet and TWEET_MEDIA in tweet[TWEET_ENTITIES] and TWEET_EXTENDED_ENTITIES in tweet \
-                and TWEET_MEDIA in tweet[TWEET_EXTENDED_ENTITIES]:
-            original_url = tweet[TWEET_ENTITIES][TWEET_MEDIA][0][URL]
-            markdown = ''
-            for media in tweet[TWEET_EXTENDED_ENTITIES][TWEET_MEDIA]:
-                if URL in media and TWEET_MEDIA_URL in media:
-                    original_expanded_url = media[TWEET_MEDIA_URL]
-                    original_filename = os.path.split(original_expanded_url)[1]
-                    archive_media_filename = tweet_id_str + '-' + original_filename
-                    archive_media_path = os.path.join(self._paths.dir_input_media, archive_media_filename)
-                    file_output_media = os.path.join(self._paths.dir_output_media, archive_media_filename)
-                    media_url = self._rel_url(file_output_media, self._paths.example_file_output_tweets)
-                    markdown += '' if not markdown and body_markdown == original_url else ''
-                    if os.path.isfile(archive_media_path):
-                        # Found a matching image, use this one
-                        if not os.path.isfile(file_output_media):
-                            shutil.copy(archive_media_path, file_output_media)
-                        markdown += f'{media_url}'
-                        # Save the online location of the best-quality version of this file, for later upgrading if wanted
-                        best_quality_url = BEST_QUALITY_URL.format(original_filename=original_filename)
-                        media_sources.append(
-                            (os.path.join(self._paths.dir_output_media, archive_media_filename), best_quality_url)
-                        )
-                    else:
-                        # Is there any other file that includes the tweet_id in its filename?
-                        archive_media_paths = glob.glob(os.path.join(self._paths.dir_input_media,
-                                                                     tweet_id_str + '*'))
-                        if len(archive_media_paths) > 0:
-                            for archive_media_path in archive_media_paths:
-                                archive_media_filename = os.path.split(archive_media_path)[-1]
-                                file_output_media = os.path.join(self._paths.dir_output_media,
-                                                                 archive_media_filename)
-                                media_url = self._rel_url(file_output_media, self._paths.example_file_output_tweets)
-                                if not os.path.isfile(file_output_media):
-                                    shutil.copy(archive_media_path, file_output_media)
-                                markdown += f'{media_url} > Your browser does not support the video tag'
-                                # Save the online location of the best-quality version of this file,
-                                # for later upgrading if wanted
-                                if TWEET_VIDEO_INFO in media and TWEET_VIDEO_INFO_VARIANTS in \
-                                        media[TWEET_VIDEO_INFO]:
-                                    best_quality_url = ''
-                                    best_bitrate = -1  # some valid videos are marked with bitrate=0 in the JSON
-                                    for variant in media[TWEET_VIDEO_INFO][TWEET_VIDEO_INFO_VARIANTS]:
-                                        if TWEET_VIDEO_INFO_VARIANTS_BITRATE in variant:
-                                            bitrate = int(variant[TWEET_VIDEO_INFO_VARIANTS_BITRATE])
-                                            if bitrate > best_bitrate:
-                                                best_quality_url = variant[URL]
-                                                best_bitrate = bitrate
-                                    if best_bitrate == -1:
-                                        logging.warning(
-                                            f"Warning No URL found for {original_url} {original_expanded_url} "
-                                            f"{archive_media_path} {media_url}")
-                                        logging.info(f"JSON: {tweet}")
-                                    else:
-                                        media_sources.append(
-                                            (os.path.join(self._paths.dir_output_media, archive_media_filename),
-                                             best_quality_url)
-                                        )
-                        else:
-                            logging.warning(
-                                f'Warning: missing local file: {archive_media_path}. Using original link instead: '
-                                f'{original_url} (expands to {original_expanded_url})')
-                            markdown += f'{original_url}'
+        if entities and TWEET_MEDIA in entities and extended_entities and TWEET_MEDIA in extended_entities:
+            original_url = entities[TWEET_MEDIA][0][URL]
+            tweet_attached_media = self._convert_tweet_media(tweet=tweet, tweet_id_str=tweet_id_str,
+                                                             original_url=original_url, media_sources=media_sources,
+                                                             media_copies=media_copies)
             body_markdown = body_markdown.replace(original_url, "")
-            tweet_attached_media = markdown
 
         # Append the original Twitter URL as a link
-        tweet_url: str = TWEET_URL.format(username=self.user_name, tweet_id_str=tweet_id_str)
+        tweet_url: str = self._tweet_url_prefix + tweet_id_str
 
         # extract user_id:handle connections
-        if TWEET_REPLY_TO_USER_ID in tweet and TWEET_REPLY_TO_SCREEN_NAME in tweet and \
-                tweet[TWEET_REPLY_TO_SCREEN_NAME] is not None:
-            reply_to_id = tweet[TWEET_REPLY_TO_USER_ID]
-            if int(reply_to_id) >= 0:  # some ids are -1, not sure why
-                handle = tweet[TWEET_REPLY_TO_SCREEN_NAME]
-                users[reply_to_id] = UserData(user_id=reply_to_id, handle=handle)
-        if TWEET_ENTITIES in tweet and TWEET_USER_MENTIONS in tweet[TWEET_ENTITIES] \
-                and tweet[TWEET_ENTITIES][TWEET_USER_MENTIONS] is not None:
-            for mention in tweet[TWEET_ENTITIES][TWEET_USER_MENTIONS]:
-                if mention is not None and 'id' in mention and SCREEN_NAME in mention:
-                    mentioned_id = mention['id']
-                    if int(mentioned_id) >= 0:  # some ids are -1, not sure why
-                        handle = mention[SCREEN_NAME]
-                        if handle is not None:
-                            users[mentioned_id] = UserData(user_id=mentioned_id, handle=handle)
-
-        tweet: Tweet = Tweet(tweet_year=tweet_year, tweet_type=tweet_type, retweeted_from=retweeted_from,
-                             replied_to_names=replied_to_names_list, replying_to_tweet=replying_to_tweet_by_user,
-                             tweet_data=body_markdown, tweeted_at=tweeted_at, tweet_url=tweet_url,
-                             tweets_attached_media=tweet_attached_media)
+        reply_to_id = tweet.get(TWEET_REPLY_TO_USER_ID)
+        reply_to_handle = tweet.get(TWEET_REPLY_TO_SCREEN_NAME)
+        # some ids are -1, not sure why
+        if reply_to_id is not None and reply_to_handle is not None and not reply_to_id.startswith('-'):
+            users[reply_to_id] = UserData(user_id=reply_to_id, handle=reply_to_handle)
+        for mention in entities and entities.get(TWEET_USER_MENTIONS) or ():
+            if mention is not None:
+                mentioned_id = mention.get('id')
+                handle = mention.get(SCREEN_NAME)
+                if mentioned_id is not None and handle is not None and not mentioned_id.startswith('-'):
+                    users[mentioned_id] = UserData(user_id=mentioned_id, handle=handle)
+
+        # every field is built from the archive's own strings above, so pydantic validation is skipped
+        tweet: Tweet = Tweet.construct(tweet_year=tweet_year, tweet_type=tweet_type, retweeted_from=retweeted_from,
+                                       replied_to_names=replied_to_names_list,
+                                       replying_to_tweet=replying_to_tweet_by_user, tweet_data=body_markdown,
+                                       tweeted_at=tweeted_at, tweet_url=tweet_url,
+                                       tweets_attached_media=tweet_attached_media)
 
         return tweet
 
-    @staticmethod
-    def _rel_url(media_path: str, document_path: str) -> str:
-        """Computes the relative URL needed to link from `document_path` to `media_path`.
-           Assumes that `document_path` points to a file (e.g. `.md` or `.html`), not a directory."""
-        return os.path.relpath(media_path, os.path.split(document_path)[0]).replace("\\", "/")
+    def _convert_tweet_media(self, tweet: dict, tweet_id_str: str, original_url: str, media_sources: list,
+                             media_copies: list) -> str:
+        """Returns the markdown linking to the media attached to a tweet, and adds the media files to copy
+           to paths.dir_output_media to `media_copies`."""
+        input_media_prefix = self._paths.input_media_prefix
+        output_media_prefix = self._paths.output_media_prefix
+        output_media_url_prefix = self._paths.output_media_url_prefix
+        input_media_files = self._paths.input_media_files
+        markdown = ''
+        for media in tweet[TWEET_EXTENDED_ENTITIES][TWEET_MEDIA]:
+            if URL in media and TWEET_MEDIA_URL in media:
+                original_expanded_url = media[TWEET_MEDIA_URL]
+                original_filename = os.path.split(original_expanded_url)[1]
+                archive_media_filename = tweet_id_str + '-' + original_filename
+                archive_media_path = input_media_prefix + archive_media_filename
+                file_output_media = output_media_prefix + archive_media_filename
+                media_url = output_media_url_prefix + archive_media_filename
+                if archive_media_filename in input_media_files:
+                    # Found a matching image, use this one
+                    media_copies.append((archive_media_path, file_output_media))
+                    markdown += f'{media_url}'
+                    # Save the online location of the best-quality version of this file, for later upgrading if wanted
+                    best_quality_url = BEST_QUALITY_URL.format(original_filename=original_filename)
+                    media_sources.append(
+                        (file_output_media, best_quality_url)
+                    )
+                else:
+                    # Is there any other file that includes the tweet_id in its filename?
+                    archive_media_filenames = self._paths.input_media_files_by_id.get(tweet_id_str, [])
+                    if len(archive_media_filenames) > 0:
+                        for archive_media_filename in archive_media_filenames:
+                            archive_media_path = input_media_prefix + archive_media_filename
+                            file_output_media = output_media_prefix + archive_media_filename
+                            media_url = output_media_url_prefix + archive_media_filename
+                            media_copies.append((archive_media_path, file_output_media))
+                            markdown += f'{media_url} > Your browser does not support the video tag'
+                            # Save the online location of the best-quality version of this file,
+                            # for later upgrading if wanted
+                            if TWEET_VIDEO_INFO in media and TWEET_VIDEO_INFO_VARIANTS in \
+                                    media[TWEET_VIDEO_INFO]:
+                                # some valid videos are marked with bitrate=0 in the JSON, so any bitrate counts
+                                variants_with_bitrate = [
+                                    variant for variant in media[TWEET_VIDEO_INFO][TWEET_VIDEO_INFO_VARIANTS]
+                                    if TWEET_VIDEO_INFO_VARIANTS_BITRATE in variant
+                                ]
+                                if not variants_with_bitrate:
+                                    logging.warning(
+                                        f"Warning No URL found for {original_url} {original_expanded_url} "
+                                        f"{archive_media_path} {media_url}")
+                                    logging.info(f"JSON: {tweet}")
+                                else:
+                                    best_variant = max(
+                                        variants_with_bitrate,
+                                        key=lambda variant: int(variant[TWEET_VIDEO_INFO_VARIANTS_BITRATE]))
+                                    media_sources.append(
+                                        (file_output_media, best_variant[URL])
+                                    )
+                    else:
+                        logging.warning(
+                            f'Warning: missing local file: {archive_media_path}. Using original link instead: '
+                            f'{original_url} (expands to {original_expanded_url})')
+                        markdown += f'{original_url}'
+        return markdown
 
     def _get_following_users(self) -> List[User]:
         """Parse paths.dir_input_data/following.js.
                 """
 
-        following: List[User] = []
         following_json = TwitterDataParser._read_json_from_js_file(
             filename=os.path.join(self._paths.dir_input_data, FOLLOWING_FILE))
-        following_ids = []
-        for follow in following_json:
-            if FOLLOWING in follow and ACCOUNT_ID in follow[FOLLOWING]:
-                following_ids.append(follow[FOLLOWING][ACCOUNT_ID])
-        for following_id in following_ids:
-            handle = self._users[following_id].handle if following_id in self._users else UNKNOWN_HANDLE
-            following.append(User(user_handle=handle, user_profile_url=self._user_id_url_template.format(following_id)))
-
-        return following
+        users = self._users
+        user_id_url = self._user_id_url
+        return [User.construct(user_handle=user.handle if user is not None else UNKNOWN_HANDLE,
+                               user_profile_url=user_id_url(account_id))
+                for follow in following_json if FOLLOWING in follow and ACCOUNT_ID in follow[FOLLOWING]
+                for account_id in (follow[FOLLOWING][ACCOUNT_ID],)
+                for user in (users.get(account_id),)]
 
     def _get_followers_users(self) -> List[User]:
         """Parse paths.dir_input_data/followers.js.
                 """
-        followers: List[User] = []
         follower_json = TwitterDataParser._read_json_from_js_file(
             filename=os.path.join(self._paths.dir_input_data, FOLLOWER_FILE))
-        follower_ids = []
-        for follower in follower_json:
-            if FOLLOWER in follower and ACCOUNT_ID in follower[FOLLOWER]:
-                follower_ids.append(follower[FOLLOWER][ACCOUNT_ID])
-        for follower_id in follower_ids:
-            handle = self._users[follower_id].handle if follower_id in self._users else UNKNOWN_HANDLE
-            followers.append(User(user_handle=handle, user_profile_url=self._user_id_url_template.format(follower_id)))
-
-        return followers
+        users = self._users
+        user_id_url = self._user_id_url
+        return [User.construct(user_handle=user.handle if user is not None else UNKNOWN_HANDLE,
+                               user_profile_url=user_id_url(account_id))
+                for follower in follower_json if FOLLOWER in follower and ACCOUNT_ID in follower[FOLLOWER]
+                for account_id in (follower[FOLLOWER][ACCOUNT_ID],)
+                for user in (users.get(account_id),)]
 
     def _get_direct_messages(self) -> List[DirectMessage]:
         """Parse paths.dir_input_data/direct-messages.js, write to one markdown file per conversation.
                 """
 
         # Read JSON file
-        dms_json = self._read_json_from_js_file(filename=os.path.join(self._paths.dir_input_data, DIRECT_MESSAGES_FILE))
+        dms_json = self._iter_json_from_js_file(filename=os.path.join(self._paths.dir_input_data, DIRECT_MESSAGES_FILE))
+
+        input_media_prefix = self._paths.input_dm_media_prefix
+        output_media_prefix = self._paths.output_media_prefix
+        media_files = self._paths.input_dm_media_files
+        media_files_by_id = self._paths.input_dm_media_files_by_id
+        handle_cache = self._handle_cache
+        user_id_url = self._user_id_url
 
-        # Parse the DMs
+        # Parse the DMs, media files are copied once all of them are parsed
         dms: List[DirectMessage] = []
+        media_copies: List[Tuple[str, str]] = []
         for conversation in dms_json:
-            if DM_CONVERSATION in conversation and CONVERSATION_ID in conversation[DM_CONVERSATION]:
-                dm_conversation = conversation[DM_CONVERSATION]
-                if MESSAGES in dm_conversation:
-                    for message in dm_conversation[MESSAGES]:
-                        if MESSAGE_CREATE in message:
-                            message_create = message[MESSAGE_CREATE]
-                            if all(tag in message_create for tag in [SENDER_ID, RECIPIENT_ID, TEXT, CREATED_AT]):
-                                to_id = message_create[RECIPIENT_ID]
-                                from_id = message_create[SENDER_ID]
-                                body = message_create[TEXT]
-                                # Replace t.co URLs with their original versions
-                                if URLS in message_create and len(message_create[URLS]) > 0:
-                                    for url in message_create[URLS]:
-                                        if URL in url and EXPANDED in url:
-                                            expanded_url = url[EXPANDED]
-                                            body = body.replace(url[URL], expanded_url)
-                                # Escape message body for markdown rendering:
-                                body_markdown = ""
-                                for word in body.split():
-                                    body_markdown += word + " "
-                                # Replace image URLs with image links to local files
-                                if DM_MEDIA_URLS in message_create \
-                                        and len(message_create[DM_MEDIA_URLS]) == 1 \
-                                        and URLS in message_create:
-                                    original_expanded_url = message_create[URLS][0][EXPANDED]
-                                    message_id = message_create['id']
-                                    media_hash_and_type = message_create[DM_MEDIA_URLS][0].split('/')[-1]
-                                    archive_media_filename = f'{message_id}-{media_hash_and_type}'
-                                    new_url = os.path.join(self._paths.dir_output_media, archive_media_filename)
-                                    archive_media_path = \
-                                        os.path.join(self._paths.dir_input_data, DIRECT_MESSAGE_MEDIA,
-                                                     archive_media_filename)
-                                    if os.path.isfile(archive_media_path):
-                                        # Found a matching image, use this one
-                                        if not os.path.isfile(new_url):
-                                            shutil.copy(archive_media_path, new_url)
-                                        image_markdown = f'{new_url}'
-                                        body_markdown = body_markdown.replace(
-                                            original_expanded_url, image_markdown
-                                        )
-                                    else:
-                                        archive_media_paths = glob.glob(
-                                            os.path.join(self._paths.dir_input_data, DIRECT_MESSAGE_MEDIA,
-                                                         message_id + '*'))
-                                        if len(archive_media_paths) > 0:
-                                            for archive_media_path in archive_media_paths:
-                                                archive_media_filename = os.path.split(archive_media_path)[-1]
-                                                media_url = os.path.join(self._paths.dir_output_media,
-                                                                         archive_media_filename)
-                                                if not os.path.isfile(media_url):
-                                                    shutil.copy(archive_media_path, media_url)
-                                                video_markdown = f'{media_url} Your browser does not support the video tag'
-                                                body_markdown = body_markdown.replace(
-                                                    original_expanded_url, video_markdown
-                                                )
-                                        else:
-                                            logging.info(f'Warning: missing local file: {archive_media_path}. '
-                                                         f'Using original link instead: {original_expanded_url})')
-
-                                created_at = message_create[CREATED_AT]  # example: 2022-01-27T15:58:52.744Z
-                                to_handle = self._users[to_id].handle if to_id in self._users \
-                                    else self._user_id_url_template.format(to_id)
-                                from_handle = self._users[from_id].handle if from_id in self._users \
-                                    else self._user_id_url_template.format(from_id)
-
-                                # make the body a quote
-                                body_markdown = '\n'.join(body_markdown.splitlines())
-                                dm: DirectMessage = DirectMessage(dm_from=from_handle, dm_to=to_handle,
-                                                                  dm_data=body_markdown, dm_at=created_at)
-                                dms.append(dm)
-
+            dm_conversation = conversation.get(DM_CONVERSATION)
+            if dm_conversation is None or CONVERSATION_ID not in dm_conversation:
+                continue
+            for message in dm_conversation.get(MESSAGES, ()):
+                message_create = message.get(MESSAGE_CREATE)
+                if message_create is None:
+                    continue
+                try:
+                    from_id, to_id, body, created_at = message_create[SENDER_ID], message_create[RECIPIENT_ID], \
+                        message_create[TEXT], message_create[CREATED_AT]  # example: 2022-01-27T15:58:52.744Z
+                except KeyError:
+                    continue
+                media_expanded_url = media_markdown = None
+                # Replace image URLs with image links to local files
+                media_urls = message_create.get(DM_MEDIA_URLS)
+                if media_urls is not None and len(media_urls) == 1 and URLS in message_create:
+                    original_expanded_url = message_create[URLS][0][EXPANDED]
+                    message_id = message_create['id']
+                    media_hash_and_type = media_urls[0].split('/')[-1]
+                    archive_media_filename = f'{message_id}-{media_hash_and_type}'
+                    new_url = output_media_prefix + archive_media_filename
+                    archive_media_path = input_media_prefix + archive_media_filename
+                    if archive_media_filename in media_files:
+                        # Found a matching image, use this one
+                        media_copies.append((archive_media_path, new_url))
+                        media_markdown = f'{new_url}'
+                    elif message_id in media_files_by_id:
+                        # otherwise copy all media files of the message, and link the first one as a video
+                        archive_media_filenames = media_files_by_id[message_id]
+                        media_copies.extend((input_media_prefix + archive_media_filename,
+                                             output_media_prefix + archive_media_filename)
+                                            for archive_media_filename in archive_media_filenames)
+                        media_markdown = f'{output_media_prefix}{archive_media_filenames[0]} ' \
+                                         f'Your browser does not support the video tag'
+                    else:
+                        logging.info(f'Warning: missing local file: {archive_media_path}. '
+                                     f'Using original link instead: {original_expanded_url})')
+                    if media_markdown is not None:
+                        media_expanded_url = original_expanded_url
+
+                # Escape message body for markdown rendering
+                body_markdown = _join_words(body.split())
+                # Replace t.co URLs with their original versions, and the media URL directly with its local link
+                for url in message_create.get(URLS, ()):
+                    if URL in url and EXPANDED in url:
+                        expanded_url = url[EXPANDED]
+                        body_markdown = body_markdown.replace(
+                            url[URL], media_markdown if expanded_url == media_expanded_url else expanded_url)
+                if media_markdown is not None:
+                    body_markdown = body_markdown.replace(media_expanded_url, media_markdown)
+
+                to_handle = handle_cache.get(to_id) or user_id_url(to_id)
+                from_handle = handle_cache.get(from_id) or user_id_url(from_id)
+
+                dm: DirectMessage = DirectMessage.construct(dm_from=from_handle, dm_to=to_handle,
+                                                            dm_data=body_markdown, dm_at=created_at)
+                dms.append(dm)
+
+        self._copy_media_files(media_copies=media_copies)
         return dms
 
     def _get_group_direct_messages(self) -> List[GroupDirectMessages]:
         """Parse data_folder/direct-messages-group.js, write to one markdown file per conversation.
                 """
         # read JSON file from archive
-        group_dms_json = self._read_json_from_js_file(
+        group_dms_json = self._iter_json_from_js_file(
             filename=os.path.join(self._paths.dir_input_data, DIRECT_MESSAGES_GROUP_FILE))
 
-        # Parse the group DMs, store messages into group_direct_message
+        input_media_prefix = self._paths.input_group_dm_media_prefix
+        output_media_prefix = self._paths.output_media_prefix
+        media_files = self._paths.input_group_dm_media_files
+        media_files_by_id = self._paths.input_group_dm_media_files_by_id
+        handle_cache = self._handle_cache
+        user_id_url = self._user_id_url
+
+        # Parse the group DMs, store messages into group_direct_message, media files are copied afterwards
         group_direct_message: List[GroupDirectMessages] = []
+        media_copies: List[Tuple[str, str]] = []
         for conversation in group_dms_json:
+            dm_conversation = conversation.get(DM_CONVERSATION)
+            if dm_conversation is None or CONVERSATION_ID not in dm_conversation:
+                continue
             group_name: Optional[str] = None
             group_dms: Optional[List[GroupDirectMessage]] = []
-            group_participant: List[str] = []
-            if DM_CONVERSATION in conversation and CONVERSATION_ID in conversation[DM_CONVERSATION]:
-                dm_conversation = conversation[DM_CONVERSATION]
-                participants = self._find_group_dm_conversation_participant_ids(conversation)
-                for participant_id in participants:
-                    if participant_id in self._users:
-                        group_participant.append(self._users[participant_id].handle)
+            participants = self._find_group_dm_conversation_participant_ids(conversation)
+            group_participant: List[str] = [handle_cache.get(participant_id) or user_id_url(participant_id)
+                                            for participant_id in participants]
+
+            for message in dm_conversation.get(MESSAGES, ()):
+                message_create = message.get(MESSAGE_CREATE)
+                if message_create is None:
+                    conversation_name_update = message.get(CONVERSATION_NAME_UPDATE)
+                    if conversation_name_update is not None and NAME in conversation_name_update:
+                        group_name = conversation_name_update[NAME]
+                    continue
+                try:
+                    from_id, body, group_dm_at = message_create[SENDER_ID], message_create[TEXT], \
+                        message_create[CREATED_AT]  # example: 2022-01-27T15:58:52.744Z
+                except KeyError:
+                    continue
+
+                media_expanded_url = media_markdown = None
+
+                # Replace image URLs with image links to local files
+                media_urls = message_create.get(DM_MEDIA_URLS)
+                if media_urls is not None and len(media_urls) == 1 and URLS in message_create:
+                    original_expanded_url = message_create[URLS][0][EXPANDED]
+                    message_id = message_create['id']
+                    media_hash_and_type = media_urls[0].split('/')[-1]
+                    archive_media_filename = f'{message_id}-{media_hash_and_type}'
+                    new_url = output_media_prefix + archive_media_filename
+                    archive_media_path = input_media_prefix + archive_media_filename
+                    if archive_media_filename in media_files:
+                        # found a matching image, use this one
+                        media_copies.append((archive_media_path, new_url))
+                        media_markdown = f'\n![]({new_url})\n'
+                    elif message_id in media_files_by_id:
+                        # otherwise copy all media files of the message, and link the first one as a video
+                        archive_media_filenames = media_files_by_id[message_id]
+                        media_copies.extend((input_media_prefix + archive_media_filename,
+                                             output_media_prefix + archive_media_filename)
+                                            for archive_media_filename in archive_media_filenames)
+                        media_markdown = f'{output_media_prefix}{archive_media_filenames[0]} ' \
+                                         f'Your browser does not support the video tag'
                     else:
-                        group_participant.append(self._user_id_url_template.format(participant_id))
-
-                if MESSAGES in dm_conversation:
-                    for message in dm_conversation[MESSAGES]:
-                        if MESSAGE_CREATE in message:
-                            message_create = message[MESSAGE_CREATE]
-                            if all(tag in message_create for tag in [SENDER_ID, TEXT, CREATED_AT]):
-                                from_id = message_create[SENDER_ID]
-                                body = message_create[TEXT]
-
-                                # Replace t.co URLs with their original versions
-                                if URLS in message_create:
-                                    for url in message_create[URLS]:
-                                        if URL in url and EXPANDED in url:
-                                            expanded_url = url[EXPANDED]
-                                            body = body.replace(url[URL], expanded_url)
-
-                                body_markdown = ""
-                                for word in body.split():
-                                    body_markdown += word + " "
-
-                                # Replace image URLs with image links to local files
-                                if DM_MEDIA_URLS in message_create \
-                                        and len(message_create[DM_MEDIA_URLS]) == 1 \
-                                        and URLS in message_create:
-                                    original_expanded_url = message_create[URLS][0][EXPANDED]
-                                    message_id = message_create['id']
-                                    media_hash_and_type = message_create[DM_MEDIA_URLS][0].split('/')[-1]
-                                    archive_media_filename = f'{message_id}-{media_hash_and_type}'
-                                    new_url = os.path.join(self._paths.dir_output_media, archive_media_filename)
-                                    archive_media_path = \
-                                        os.path.join(self._paths.dir_input_data, DIRECT_MESSAGES_GROUP_MEDIA,
-                                                     archive_media_filename)
-                                    if os.path.isfile(archive_media_path):
-                                        # found a matching image, use this one
-                                        if not os.path.isfile(new_url):
-                                            shutil.copy(archive_media_path, new_url)
-                                        image_markdown = f'\n![]({new_url})\n'
-                                        body_markdown = body_markdown.replace(
-                                            original_expanded_url, image_markdown
-                                        )
-                                    else:
-                                        archive_media_paths = glob.glob(
-                                            os.path.join(self._paths.dir_input_data, DIRECT_MESSAGES_GROUP_MEDIA,
-                                                         message_id + '*'))
-                                        if len(archive_media_paths) > 0:
-                                            for archive_media_path in archive_media_paths:
-                                                archive_media_filename = os.path.split(archive_media_path)[-1]
-                                                media_url = os.path.join(self._paths.dir_output_media,
-                                                                         archive_media_filename)
-                                                if not os.path.isfile(media_url):
-                                                    shutil.copy(archive_media_path, media_url)
-                                                video_markdown = f'{media_url} Your browser does not support the video tag'
-                                                body_markdown = body_markdown.replace(
-                                                    original_expanded_url, video_markdown
-                                                )
-                                        else:
-                                            logging.warning(f'Warning: missing local file: {archive_media_path}. '
-                                                            f'Using original link instead: {original_expanded_url})')
-
-                                group_dm_at = message_create[CREATED_AT]  # example: 2022-01-27T15:58:52.744Z
-                                group_dm_from = self._users[from_id].handle if from_id in self._users \
-                                    else self._user_id_url_template.format(from_id)
-                                group_dm_data = '\n>'.join(body_markdown.splitlines())
-                                group_dms.append(
-                                    GroupDirectMessage(group_dm_from=group_dm_from, group_dm_data=group_dm_data,
-                                                       group_dm_at=group_dm_at))
-                        elif CONVERSATION_NAME_UPDATE in message:
-                            conversation_name_update = message[CONVERSATION_NAME_UPDATE]
-                            if all(tag in conversation_name_update for tag in [NAME]):
-                                group_name = conversation_name_update[NAME]
-
-                group_direct_message.append(GroupDirectMessages(group_name=group_name, group_dms=group_dms,
-                                                                group_participant=group_participant))
-
+                        logging.warning(f'Warning: missing local file: {archive_media_path}. '
+                                        f'Using original link instead: {original_expanded_url})')
+                    if media_markdown is not None:
+                        media_expanded_url = original_expanded_url
+
+                # Escape message body for markdown rendering
+                body_markdown = _join_words(body.split())
+                # Replace t.co URLs with their original versions, and the media URL directly with its local link
+                for url in message_create.get(URLS, ()):
+                    if URL in url and EXPANDED in url:
+                        expanded_url = url[EXPANDED]
+                        body_markdown = body_markdown.replace(
+                            url[URL], media_markdown if expanded_url == media_expanded_url else expanded_url)
+                if media_markdown is not None:
+                    body_markdown = body_markdown.replace(media_expanded_url, media_markdown)
+
+                group_dm_from = handle_cache.get(from_id) or user_id_url(from_id)
+                group_dm_data = '\n>'.join(body_markdown.splitlines())
+                group_dms.append(GroupDirectMessage.construct(group_dm_from=group_dm_from, group_dm_data=group_dm_data,
+                                                              group_dm_at=group_dm_at))
+
+            group_direct_message.append(GroupDirectMessages.construct(group_name=group_name, group_dms=group_dms,
+                                                                      group_participant=group_participant))
+
+        self._copy_media_files(media_copies=media_copies)
         return group_direct_message
 
     @staticmethod
     def _read_json_from_js_file(filename: str):
-        """Reads the contents of a Twitter-produced .js file into a dictionary."""
+        """Reads the contents of a Twitter-produced .js file into a dictionary.
+           Files of at least JS_FILE_MMAP_MIN_SIZE bytes are memory-mapped, so they aren't copied onto the heap
+           before parsing."""
+        logging.info(f'Parsing {filename}...')
+        with open(filename, READ_BINARY_MODE) as f:
+            if os.fstat(f.fileno()).st_size < JS_FILE_MMAP_MIN_SIZE:
+                return TwitterDataParser._parse_js_file_contents(f.read())
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return TwitterDataParser._parse_js_file_contents(data)
+
+    @staticmethod
+    def _parse_js_file_contents(data):
+        """Parses the contents of a Twitter-produced .js file, given as `bytes` or `mmap`, into a dictionary."""
+        # if the JSON has no real content, it can happen that the file is only one line long.
+        # in this case, return an empty dict to avoid errors while trying to read non-existing lines.
+        first_line_end = data.find(b'\n')
+        if first_line_end == -1 or first_line_end == len(data) - 1:
+            return {}
+        # convert js file to JSON: drop the `window.YTD.<name>.part0 = ` assignment in front of the array
+        json_start = data.find(b'[', 0, first_line_end)
+        # parse the resulting JSON and return as a dict, the view must be released before an mmap can be closed
+        with memoryview(data)[json_start:] as json_data:
+            return _json_loads(json_data)
+
+    @staticmethod
+    def _iter_json_from_js_file(filename: str) -> Iterator[dict]:
+        """Yields the items of the array in a Twitter-produced .js file (tweets, DM conversations, ...) one by one.
+           When ijson is installed, files of at least JS_FILE_STREAMING_MIN_SIZE bytes are parsed incrementally,
+           so only one item is held in memory at a time. Files with surrogate escapes are always read in one go,
+           ijson's C backend replaces lone surrogates with '?' or fails on them, where the json module keeps them."""
+        if ijson is None or os.path.getsize(filename) < JS_FILE_STREAMING_MIN_SIZE \
+                or TwitterDataParser._has_surrogate_escapes(filename):
+            yield from TwitterDataParser._read_json_from_js_file(filename=filename)
+            return
         logging.info(f'Parsing {filename}...')
-        with open(filename, READ_MODE, encoding=UTF_8) as f:
-            data = f.readlines()
-            # if the JSON has no real content, it can happen that the file is only one line long.
-            # in this case, return an empty dict to avoid errors while trying to read non-existing lines.
-            if len(data) <= 1:
-                return {}
-            # convert js file to JSON: replace first line with just '[', squash lines into a single string
-            prefix = '['
-            if '{' in data[0]:
-                prefix += ' {'
-            data = prefix + ''.join(data[1:])
-            # parse the resulting JSON and return as a dict
-            return json.loads(data)
+        with open(filename, READ_BINARY_MODE) as f:
+            first_line = f.readline()
+            # same as in `_read_json_from_js_file`: a file with a single line has no real content
+            if not f.read(1):
+                return
+            # skip the `window.YTD.<name>.part0 = ` assignment in front of the array
+            f.seek(first_line.find(b'['))
+            yield from ijson.items(f, 'item', use_float=True)
+
+    @staticmethod
+    def _has_surrogate_escapes(filename: str) -> bool:
+        """Checks whether a non-empty .js file contains any escaped UTF-16 surrogate, without reading it to the heap."""
+        with open(filename, READ_BINARY_MODE) as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _SURROGATE_ESCAPE_RE.search(data) is not None
 
     def retrieve_information(self) -> TwitterUserInfo:
 
-        twitter_user_info: TwitterUserInfo = TwitterUserInfo(user_name=self.user_name,
-                                                             following=self.following,
-                                                             followers=self.followers,
-                                                             tweets=self.tweets,
-                                                             dms=self.direct_messages,
-                                                             groups_dms=self.group_direct_messages,
-                                                             following_count=len(self.following),
-                                                             follower_count=len(self.followers))
+        # the parsed lists hold already built models, validating them again would copy every one of them
+        twitter_user_info: TwitterUserInfo = TwitterUserInfo.construct(user_name=self.user_name,
+                                                                       following=self.following,
+                                                                       followers=self.followers,
+                                                                       tweets=self.tweets,
+                                                                       dms=self.direct_messages,
+                                                                       groups_dms=self.group_direct_messages,
+                                                                       following_count=len(self.following),
+                                                                       follower_count=len(self.followers))
 
         return twitter_user_info
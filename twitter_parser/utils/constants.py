@@ -1,6 +1,8 @@
 UTF_8 = 'utf-8'
 WRITE_MODE = 'w'
+WRITE_BINARY_MODE = 'wb'
 READ_MODE = 'r'
+READ_BINARY_MODE = 'rb'
 GUEST_TOKEN = 'guest_token'
 ACCOUNT = 'account'
 USERNAME = 'username'
@@ -13,6 +15,9 @@ MEDIA = 'media'
 TWITTER_PARSER_CACHE = 'twitter_parser-cache'
 TWITTER_GUEST_TOKEN_ENDPOINT = 'https://api.twitter.com/1.1/guest/activate.json'
 TWITTER_USER_METADATA_ENDPOINT = 'https://api.twitter.com/1.1/users/lookup.json?user_id={user_id_list}'
+TWITTER_USER_LOOKUP_BATCH_SIZE = 100
+TWITTER_API_MAX_WORKERS = 8
+TWITTER_API_MAX_RETRIES = 3
 BEARER_TOKEN = 'Paste you Bearer Token here'
 SCREEN_NAME = 'screen_name'
 CHARACTERS_TO_ESCAPE = r'\_*[]()~`>#+-=|{}.!'
@@ -70,6 +75,14 @@ DIRECT_MESSAGES_GROUP_MEDIA = 'direct_messages_group_media'
 CONVERSATION_NAME_UPDATE = "conversationNameUpdate"
 NAME = 'name'
 KNOWN_TWEETS_JSON = "known_tweets.json"
+USER_HANDLES_CACHE_FILE = "user_handles.json"
+TWEET_CONVERSION_BATCH_SIZE = 256
+ZIP_EXTRACTION_MAX_WORKERS = 4
+MEDIA_COPY_MAX_WORKERS = 8
+# streaming a .js file with ijson trades speed for memory: it holds only one item at a time, but parses
+# roughly 2x slower than reading the whole file with orjson or json, so only files from this size on are streamed
+JS_FILE_STREAMING_MIN_SIZE = 1024 * 1024
+JS_FILE_MMAP_MIN_SIZE = 1024 * 1024
 LIST_OF_FILES = [
     "TweetArchive.html",
     "*Tweet-Archive*.html",